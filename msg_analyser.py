@@ -1,26 +1,164 @@
 from flask import Flask, jsonify, request, send_file
 from flask_cors import CORS
+import copy
+import io
+import operator
 import os
 import json
 import extract_msg
 from datetime import datetime
-import tempfile
-import shutil
-import glob
 from typing import List, Dict, Any
+from dataclasses import dataclass, field, asdict
+from collections import OrderedDict
 import mimetypes
+import hashlib
+import html
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
+if orjson is not None:
+    from flask.json.provider import JSONProvider
+
+    class ORJSONProvider(JSONProvider):
+        """Serialize API responses with orjson instead of stdlib json"""
+
+        def dumps(self, obj, **kwargs):
+            return orjson.dumps(obj).decode('utf-8')
+
+        def loads(self, s, **kwargs):
+            return orjson.loads(s)
+
+    app.json = ORJSONProvider(app)
+
 # Configuration
 MSG_FOLDER = "msg_files"  # Base folder containing process subfolders
 BASE_DIR = os.path.abspath(MSG_FOLDER)
 
+# Markers of quoted/forwarded content, matched in one pass over the body
+THREAD_RE = re.compile(r'original message|forwarded message|from:|sent:|to:|subject:', re.IGNORECASE)
+
+# Reply/forward prefixes stripped before hashing subjects into thread IDs
+SUBJECT_PREFIX_RE = re.compile(r'^\s*(re|fw|fwd|tr|aw)\s*:\s*', re.IGNORECASE)
+
+# Splits recipient lists on semicolons, folding the surrounding whitespace into the split
+SEMI_SPLIT_RE = re.compile(r'\s*;\s*')
+
+# Fallback timestamp for unparseable dates, refreshed at 1s granularity so
+# a batch full of bad dates doesn't construct a datetime per message
+_NOW_CACHE = [0.0, '', 0.0]
+
+def _now_fallback():
+    t = time.time()
+    if t - _NOW_CACHE[0] > 1.0:
+        now = datetime.now()
+        _NOW_CACHE[0] = t
+        _NOW_CACHE[1] = now.isoformat()
+        _NOW_CACHE[2] = now.timestamp()
+    return _NOW_CACHE[1], _NOW_CACHE[2]
+
+# Statuses a message can be tagged with
+VALID_STATUSES = frozenset(('keep', 'review', 'untagged'))
+
+# Fields a comment POST must carry
+REQUIRED_COMMENT_FIELDS = frozenset(('key', 'labels', 'text'))
+
+# Attachment extension (without dot) -> display type
+EXT_TYPE_MAP = {
+    'pdf': 'PDF',
+    'doc': 'Word',
+    'docx': 'Word',
+    'xls': 'Excel',
+    'xlsx': 'Excel',
+    'ppt': 'PowerPoint',
+    'pptx': 'PowerPoint',
+    'txt': 'Text',
+    'jpg': 'Image',
+    'jpeg': 'Image',
+    'png': 'Image',
+    'gif': 'Image',
+    'zip': 'Archive',
+    'rar': 'Archive'
+}
+
+@dataclass(slots=True)
+class ParsedMessage:
+    """A parsed .msg file; slotted to keep thousands of cached messages compact"""
+    id: str
+    subject: str
+    sender: str
+    to: str
+    date: str
+    sort_ts: float
+    body: str
+    threadId: str
+    filename: str
+    containsThread: bool
+    status: str = "untagged"
+    # to/cc/bcc kept as separate lists so the client doesn't re-split "to"
+    recipients: Dict[str, List[str]] = field(default_factory=dict)
+    attachments: List[Dict[str, str]] = field(default_factory=list)
+    comments: List[Dict[str, Any]] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to the wire format used by the API"""
+        return {
+            "id": self.id,
+            "subject": self.subject,
+            "from": self.sender,
+            "to": self.to,
+            # Pre-escaped variants so the client can interpolate into
+            # innerHTML without a per-render escaping pass
+            "subject_html": html.escape(self.subject, quote=True),
+            "from_html": html.escape(self.sender, quote=True),
+            "to_html": html.escape(self.to, quote=True),
+            "date": self.date,
+            "body": self.body,
+            "status": self.status,
+            "recipients": dict(self.recipients),
+            "threadId": self.threadId,
+            "filename": self.filename,
+            "attachments": list(self.attachments),
+            "containsThread": self.containsThread,
+            "comments": list(self.comments)
+        }
+
 class MSGAnalyzer:
     def __init__(self, base_folder: str):
         self.base_folder = base_folder
         self._ensure_base_folder()
+        # Parsed .msg cache: path -> (mtime_ns, size, message_data)
+        self._file_cache = {}
+        # Per-process list cache: process_id -> (folder fingerprint, sorted messages)
+        self._msg_cache = {}
+        self.thread_pool = ThreadPoolExecutor(max_workers=(os.cpu_count() or 4))
+        # Below this many files the pool overhead outweighs the parallelism
+        self.parallel_threshold = 8
+        # Attachment payloads extracted during parsing, so downloads skip a second OLE parse
+        self.cache_folder = os.path.join(self.base_folder, ".cache")
+        self.attachment_cache_limit = 25 * 1024 * 1024  # bytes
+        self._attachment_paths = {}  # (message_id, index) -> cached file path
+        # Recently opened Message handles: (path, mtime_ns) -> open Message
+        self._open_msg_lru = OrderedDict()
+        self._open_msg_lock = threading.Lock()
+        self.open_msg_limit = 32
     
     def _ensure_base_folder(self):
         """Ensure the base folder exists"""
@@ -32,16 +170,18 @@ class MSGAnalyzer:
         """Get list of available processes (subfolders)"""
         processes = []
         try:
-            for item in os.listdir(self.base_folder):
-                item_path = os.path.join(self.base_folder, item)
-                if os.path.isdir(item_path):
-                    # Count .msg files in this process folder
-                    msg_files = glob.glob(os.path.join(item_path, "*.msg"))
-                    processes.append({
-                        "id": item,
-                        "name": item.replace("_", " ").title(),
-                        "count": len(msg_files)
-                    })
+            with os.scandir(self.base_folder) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False) and not entry.name.startswith('.'):
+                        # Count .msg files in this process folder
+                        with os.scandir(entry.path) as files:
+                            count = sum(1 for f in files
+                                        if f.name.lower().endswith('.msg') and f.is_file(follow_symlinks=False))
+                        processes.append({
+                            "id": entry.name,
+                            "name": entry.name.replace("_", " ").title(),
+                            "count": count
+                        })
         except Exception as e:
             print(f"Error reading processes: {e}")
         
@@ -61,197 +201,349 @@ class MSGAnalyzer:
         
         print("Created sample folder structure. Please add .msg files to the subfolders.")
     
-    def get_messages_for_process(self, process_id: str) -> List[Dict[str, Any]]:
+    def get_messages_for_process(self, process_id: str, include_body: bool = True) -> List[Dict[str, Any]]:
         """Get all messages for a specific process"""
         messages = []
         process_path = os.path.join(self.base_folder, process_id)
-        
+
         if not os.path.exists(process_path):
             return messages
-        
+
         try:
-            msg_files = glob.glob(os.path.join(process_path, "*.msg"))
-            
-            for msg_file in msg_files:
-                try:
-                    message_data = self._parse_msg_file(msg_file, process_id)
-                    if message_data:
-                        messages.append(message_data)
-                except Exception as e:
-                    print(f"Error parsing {msg_file}: {e}")
-                    continue
-            
-            # Sort messages by date (newest first)
-            messages.sort(key=lambda x: x.get('date', ''), reverse=True)
-            
+            with os.scandir(process_path) as it:
+                msg_files = [(entry.path, entry.stat())
+                             for entry in it
+                             if entry.name.lower().endswith('.msg') and entry.is_file(follow_symlinks=False)]
+
+            # Skip the rebuild entirely while the folder is unchanged
+            fingerprint = (len(msg_files), max((st.st_mtime_ns for _, st in msg_files), default=0))
+            cached = self._msg_cache.get((process_id, include_body))
+            if cached and cached[0] == fingerprint:
+                return [message.to_dict() for message in cached[1]]
+
+            if len(msg_files) < self.parallel_threshold:
+                for msg_file, st in msg_files:
+                    try:
+                        message_data = self._parse_msg_cached(msg_file, process_id, st, include_body)
+                        if message_data:
+                            messages.append(message_data)
+                    except Exception as e:
+                        print(f"Error parsing {msg_file}: {e}")
+                        continue
+            else:
+                # Parse independent files in parallel on the shared pool
+                future_to_file = {
+                    self.thread_pool.submit(self._parse_msg_cached, msg_file, process_id, st, include_body): msg_file
+                    for msg_file, st in msg_files
+                }
+                for future in as_completed(future_to_file):
+                    try:
+                        message_data = future.result()
+                        if message_data:
+                            messages.append(message_data)
+                    except Exception as e:
+                        print(f"Error parsing {future_to_file[future]}: {e}")
+                        continue
+
+            # Sort messages by date (newest first); attrgetter on a numeric key
+            # is cheaper than string comparisons through a lambda
+            messages.sort(key=operator.attrgetter('sort_ts'), reverse=True)
+
+            self._msg_cache[(process_id, include_body)] = (fingerprint, messages)
+
         except Exception as e:
             print(f"Error reading messages for process {process_id}: {e}")
-        
-        return messages
+
+        return [message.to_dict() for message in messages]
+
+    def invalidate_file(self, file_path: str):
+        """Drop cache entries for a .msg file that changed on disk"""
+        process_id = os.path.basename(os.path.dirname(file_path))
+        for include_body in (True, False):
+            self._file_cache.pop((file_path, include_body), None)
+            self._msg_cache.pop((process_id, include_body), None)
+
+    def get_process_fingerprint(self, process_id: str):
+        """Cheap change fingerprint for a process folder: (file count, newest mtime)"""
+        process_path = os.path.join(self.base_folder, process_id)
+        try:
+            with os.scandir(process_path) as it:
+                mtimes = [entry.stat().st_mtime_ns
+                          for entry in it
+                          if entry.name.lower().endswith('.msg') and entry.is_file(follow_symlinks=False)]
+        except OSError:
+            return (0, 0)
+        return (len(mtimes), max(mtimes, default=0))
+
+    def get_message_body(self, process_id: str, message_id: str) -> Dict[str, Any]:
+        """Get the body of a single message, parsing it on demand"""
+        original_msg_id = message_id.removeprefix(f"{process_id}_")
+        msg_file_path = os.path.join(self.base_folder, process_id, f"{original_msg_id}.msg")
+
+        if not os.path.exists(msg_file_path):
+            raise FileNotFoundError(f"Message file not found: {msg_file_path}")
+
+        message = self._parse_msg_cached(msg_file_path, process_id)
+        return {
+            "id": message.id,
+            "body": message.body,
+            "attachments": list(message.attachments),
+            "containsThread": message.containsThread
+        }
     
-    def _parse_msg_file(self, file_path: str, process_id: str) -> Dict[str, Any]:
+    def _parse_msg_cached(self, file_path: str, process_id: str, st: os.stat_result = None,
+                          include_body: bool = True) -> 'ParsedMessage':
+        """Parse a .msg file, reusing the cached result while the file is unchanged"""
+        if st is None:
+            st = os.stat(file_path)
+        cache_key = (file_path, include_body)
+        cached = self._file_cache.get(cache_key)
+        if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            return copy.deepcopy(cached[2])
+
+        # Second level: parses persisted to disk survive restarts
+        disk_key = f"{st.st_mtime_ns}:{st.st_size}:{int(include_body)}"
+        message_data = self._read_disk_cache(process_id, file_path, disk_key, include_body)
+
+        if message_data is None:
+            message_data = self._parse_msg_file(file_path, process_id, include_body)
+            if message_data:
+                self._write_disk_cache(process_id, file_path, disk_key, message_data, include_body)
+
+        if message_data:
+            self._file_cache[cache_key] = (st.st_mtime_ns, st.st_size, copy.deepcopy(message_data))
+
+        return message_data
+
+    def _disk_cache_path(self, process_id: str, file_path: str, include_body: bool) -> str:
+        # Full and headers-only parses are distinct cache entries; sharing
+        # one file would make the two variants overwrite each other
+        variant = 'full' if include_body else 'headers'
+        return os.path.join(self.cache_folder, 'parsed', process_id,
+                            f"{os.path.basename(file_path)}.{variant}.json")
+
+    def _read_disk_cache(self, process_id: str, file_path: str, disk_key: str,
+                         include_body: bool = True):
+        """Load a persisted parse if it matches the file's current mtime and size"""
+        try:
+            with open(self._disk_cache_path(process_id, file_path, include_body), 'r', encoding='utf-8') as f:
+                payload = json.load(f)
+            if payload.get('_key') == disk_key:
+                return ParsedMessage(**payload['message'])
+        except (OSError, ValueError, TypeError):
+            # Missing or corrupt cache entries just trigger a fresh parse
+            pass
+        return None
+
+    def _write_disk_cache(self, process_id: str, file_path: str, disk_key: str,
+                          message_data: 'ParsedMessage', include_body: bool = True) -> None:
+        """Persist a parse to disk, written atomically so readers never see partial files"""
+        cache_path = self._disk_cache_path(process_id, file_path, include_body)
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            tmp_path = cache_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'_key': disk_key, 'message': asdict(message_data)}, f)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            print(f"Error writing parse cache for {file_path}: {e}")
+
+    def _parse_msg_file(self, file_path: str, process_id: str, include_body: bool = True) -> 'ParsedMessage':
         """Parse a single .msg file and extract its content"""
         msg = extract_msg.openMsg(file_path)
-        
+
         try:
             # Extract basic message properties
             subject = msg.subject or "No Subject"
             sender = msg.sender or "Unknown Sender"
-            recipients = self._parse_recipients(msg)
-            date = self._parse_date(msg.date)
-            body = msg.body or ""
-            
+            recipients, recipients_by_field = self._parse_recipients(msg)
+            date, sort_ts = self._parse_date(msg.date)
+
             # Generate a unique ID based on filename and process
             filename = os.path.basename(file_path)
             message_id = f"{process_id}_{os.path.splitext(filename)[0]}"
-            
-            # Extract attachments
-            attachments = self._extract_attachments(msg, message_id)
-            
-            # Parse email headers for threading information
-            thread_info = self._parse_thread_info(msg, subject)
-            
-            message_data = {
-                "id": message_id,
-                "subject": subject,
-                "from": sender,
-                "to": recipients,
-                "date": date,
-                "body": body,
-                "status": "untagged",  # Default status
-                "threadId": thread_info["thread_id"],
-                "filename": filename,
-                "attachments": attachments,
-                "containsThread": thread_info["contains_thread"],
-                "comments": []  # Will be stored separately
-            }
-            
-            return message_data
-            
+
+            if include_body:
+                # Body and attachment streams are the expensive part of the
+                # parse; read each OLE stream once and work from the local
+                body = msg.body or ""
+                attachments = self._extract_attachments(msg, message_id)
+                thread_info = self._parse_thread_info(subject, body)
+            else:
+                body = ""
+                attachments = []
+                thread_info = self._parse_thread_info(subject)
+
+            return ParsedMessage(
+                id=message_id,
+                subject=subject,
+                sender=sender,
+                to=recipients,
+                date=date,
+                sort_ts=sort_ts,
+                body=body,
+                threadId=thread_info["thread_id"],
+                filename=filename,
+                containsThread=thread_info["contains_thread"],
+                recipients=recipients_by_field,
+                attachments=attachments
+            )
+
         finally:
             msg.close()
     
-    def _parse_recipients(self, msg) -> str:
-        """Parse recipients from the message"""
-        recipients = []
-        
-        # To recipients
-        if hasattr(msg, 'to') and msg.to:
-            recipients.extend([r.strip() for r in msg.to.split(';')])
-        
-        # CC recipients
-        if hasattr(msg, 'cc') and msg.cc:
-            recipients.extend([r.strip() for r in msg.cc.split(';')])
-        
-        # BCC recipients (if available)
-        if hasattr(msg, 'bcc') and msg.bcc:
-            recipients.extend([r.strip() for r in msg.bcc.split(';')])
-        
-        return ', '.join(recipients) if recipients else "No Recipients"
+    def _parse_recipients(self, msg):
+        """Parse recipients, returning (joined display string, per-field lists)
+
+        The per-field dict keeps the to/cc/bcc distinction instead of
+        flattening everything into one string the client has to re-split.
+        """
+        by_field = {}
+        for fieldname in ('to', 'cc', 'bcc'):
+            raw = getattr(msg, fieldname, None)
+            if raw:
+                by_field[fieldname] = [r for r in SEMI_SPLIT_RE.split(raw.strip()) if r]
+        joined = ', '.join(r for values in by_field.values() for r in values)
+        return joined or "No Recipients", by_field
     
-    def _parse_date(self, date_str: str) -> str:
-        """Parse and format the date"""
-        if not date_str:
-            return datetime.now().isoformat()
-        
-        try:
-            # Try to parse various date formats
-            for fmt in ['%a, %d %b %Y %H:%M:%S %z', '%a, %d %b %Y %H:%M:%S %Z', '%Y-%m-%d %H:%M:%S']:
+    def _parse_date(self, date_str):
+        """Parse the date, returning (iso string, epoch timestamp)"""
+        dt = None
+
+        # Newer extract_msg versions already return a datetime
+        if isinstance(date_str, datetime):
+            dt = date_str
+        elif date_str:
+            try:
+                # RFC 2822 is the format .msg headers carry
+                dt = parsedate_to_datetime(date_str)
+            except (TypeError, ValueError):
                 try:
-                    dt = datetime.strptime(date_str, fmt)
-                    return dt.isoformat()
+                    dt = datetime.fromisoformat(date_str)
                 except ValueError:
-                    continue
-            
-            # If no format works, use current date
-            return datetime.now().isoformat()
-        except:
-            return datetime.now().isoformat()
+                    pass
+
+        if dt is None:
+            # If no format works, use the (cached) current date
+            return _now_fallback()
+
+        return dt.isoformat(), dt.timestamp()
     
     def _extract_attachments(self, msg, message_id: str) -> List[Dict[str, str]]:
         """Extract attachment information from the message"""
         attachments = []
-        
-        if hasattr(msg, 'attachments') and msg.attachments:
-            for i, attachment in enumerate(msg.attachments):
-                if hasattr(attachment, 'longFilename') and attachment.longFilename:
-                    attachments.append({
-                        "name": attachment.longFilename,
-                        "url": f"/api/attachment/{message_id}/{i}",
-                        "type": self._get_attachment_type(attachment.longFilename)
-                    })
-        
+
+        for i, attachment in enumerate(getattr(msg, 'attachments', None) or []):
+            name = getattr(attachment, 'longFilename', None)
+            if name:
+                attachments.append({
+                    "name": name,
+                    "url": f"/api/attachment/{message_id}/{i}",
+                    "type": self._get_attachment_type(name)
+                })
+                self._cache_attachment_payload(message_id, i, attachment)
+
         return attachments
+
+    def _cache_attachment_payload(self, message_id: str, index: int, attachment) -> None:
+        """Write an attachment's bytes to the cache folder so downloads skip reparsing"""
+        try:
+            data = attachment.data
+            if data is None or len(data) > self.attachment_cache_limit:
+                return
+
+            cache_dir = os.path.join(self.cache_folder, hashlib.sha1(message_id.encode('utf-8')).hexdigest())
+            os.makedirs(cache_dir, exist_ok=True)
+            cache_path = os.path.join(cache_dir, f"{index}_{os.path.basename(attachment.longFilename)}")
+
+            with open(cache_path, 'wb') as f:
+                f.write(data)
+
+            self._attachment_paths[(message_id, index)] = cache_path
+        except Exception as e:
+            print(f"Error caching attachment {index} of {message_id}: {e}")
     
     def _get_attachment_type(self, filename: str) -> str:
         """Get attachment type based on file extension"""
-        ext = os.path.splitext(filename)[1].lower()
-        type_map = {
-            '.pdf': 'PDF',
-            '.doc': 'Word',
-            '.docx': 'Word',
-            '.xls': 'Excel',
-            '.xlsx': 'Excel',
-            '.ppt': 'PowerPoint',
-            '.pptx': 'PowerPoint',
-            '.txt': 'Text',
-            '.jpg': 'Image',
-            '.jpeg': 'Image',
-            '.png': 'Image',
-            '.gif': 'Image',
-            '.zip': 'Archive',
-            '.rar': 'Archive'
-        }
-        return type_map.get(ext, 'File')
+        return EXT_TYPE_MAP.get(filename.rpartition('.')[2].lower(), 'File')
     
-    def _parse_thread_info(self, msg, subject: str) -> Dict[str, Any]:
-        """Parse threading information from email headers"""
-        thread_id = f"thread_{hash(subject) % 10000}"  # Simple thread ID based on subject
-        
-        contains_thread = False
-        
-        # Check for common thread indicators in body or headers
-        if hasattr(msg, 'body') and msg.body:
-            body_lower = msg.body.lower()
-            thread_indicators = ['original message', 'forwarded message', 'from:', 'sent:', 'to:', 'subject:']
-            contains_thread = any(indicator in body_lower for indicator in thread_indicators)
+    def _parse_thread_info(self, subject: str, body: str = "") -> Dict[str, Any]:
+        """Parse threading information from the subject and an already-read body
+
+        Takes the body string rather than the Message so callers decode the
+        body OLE stream once and reuse it.
+        """
+        # Strip reply/forward prefixes so a whole thread hashes to one ID,
+        # and use a stable hash so IDs survive server restarts
+        normalized = subject
+        while True:
+            stripped = SUBJECT_PREFIX_RE.sub('', normalized)
+            if stripped == normalized:
+                break
+            normalized = stripped
+        normalized = ' '.join(normalized.casefold().split())
+        digest = hashlib.blake2b(normalized.encode('utf-8'), digest_size=8).hexdigest()
+        thread_id = f"thread_{digest}"
+
+        # Check for common thread indicators in the body
+        contains_thread = bool(body) and bool(THREAD_RE.search(body))
         
         return {
             "thread_id": thread_id,
             "contains_thread": contains_thread
         }
     
-    def get_attachment(self, process_id: str, message_id: str, attachment_index: int) -> str:
-        """Get the file path for a specific attachment"""
+    def get_attachment(self, process_id: str, message_id: str, attachment_index: int):
+        """Get an attachment as (filename, source) where source is a cached path or raw bytes"""
+        # Fast path: payload was cached while the message was parsed
+        cached_path = self._attachment_paths.get((message_id, attachment_index))
+        if cached_path and os.path.exists(cached_path):
+            return os.path.basename(cached_path).split('_', 1)[-1], cached_path
+
         # Extract original filename from message_id
-        original_msg_id = message_id.replace(f"{process_id}_", "")
+        original_msg_id = message_id.removeprefix(f"{process_id}_")
         msg_file_path = os.path.join(self.base_folder, process_id, f"{original_msg_id}.msg")
-        
+
         if not os.path.exists(msg_file_path):
             raise FileNotFoundError(f"Message file not found: {msg_file_path}")
-        
-        # Open the message and extract the specific attachment
-        msg = extract_msg.openMsg(msg_file_path)
-        try:
-            if hasattr(msg, 'attachments') and msg.attachments:
-                if 0 <= attachment_index < len(msg.attachments):
-                    attachment = msg.attachments[attachment_index]
-                    
-                    # Create a temporary file for the attachment
-                    temp_dir = tempfile.mkdtemp()
-                    temp_path = os.path.join(temp_dir, attachment.longFilename)
-                    
-                    # Save attachment to temporary file
-                    with open(temp_path, 'wb') as f:
-                        f.write(attachment.data)
-                    
-                    return temp_path
-                else:
-                    raise IndexError(f"Attachment index {attachment_index} out of range")
+
+        # Reuse a recently opened handle; closed on LRU eviction, not per call
+        msg = self._open_msg_cached(msg_file_path)
+        if hasattr(msg, 'attachments') and msg.attachments:
+            if 0 <= attachment_index < len(msg.attachments):
+                attachment = msg.attachments[attachment_index]
+                return attachment.longFilename, attachment.data
             else:
-                raise ValueError("No attachments found in message")
-        finally:
-            msg.close()
+                raise IndexError(f"Attachment index {attachment_index} out of range")
+        else:
+            raise ValueError("No attachments found in message")
+
+    def _open_msg_cached(self, file_path: str):
+        """Open a .msg via a bounded LRU keyed by path and mtime.
+
+        Each openMsg re-parses the OLE container; consecutive attachment
+        downloads from the message being browsed hit the same file, so a
+        small pool of open handles avoids the repeat parse. Evicted
+        handles are closed.
+        """
+        key = (file_path, os.stat(file_path).st_mtime_ns)
+        with self._open_msg_lock:
+            msg = self._open_msg_lru.get(key)
+            if msg is not None:
+                self._open_msg_lru.move_to_end(key)
+                return msg
+
+        msg = extract_msg.openMsg(file_path)
+        with self._open_msg_lock:
+            self._open_msg_lru[key] = msg
+            self._open_msg_lru.move_to_end(key)
+            while len(self._open_msg_lru) > self.open_msg_limit:
+                _, evicted = self._open_msg_lru.popitem(last=False)
+                try:
+                    evicted.close()
+                except Exception:
+                    pass
+        return msg
     
     def update_message_status(self, process_id: str, message_id: str, status: str) -> bool:
         """Update the status of a message"""
@@ -269,6 +561,37 @@ class MSGAnalyzer:
 # Initialize the MSG analyzer
 msg_analyzer = MSGAnalyzer(BASE_DIR)
 
+# Seconds between background revalidations of the message caches
+CACHE_REFRESH_INTERVAL = 5.0
+
+def _cache_warmer():
+    """Populate the parse caches at startup, then keep them fresh in the background"""
+    while True:
+        try:
+            for process in msg_analyzer.get_processes():
+                msg_analyzer.get_messages_for_process(process["id"])
+        except Exception as e:
+            print(f"Error warming message caches: {e}")
+        time.sleep(CACHE_REFRESH_INTERVAL)
+
+threading.Thread(target=_cache_warmer, daemon=True).start()
+
+class _MsgFolderWatcher(FileSystemEventHandler):
+    """Invalidates caches when a .msg file changes, instead of re-stating per request"""
+
+    def on_any_event(self, event):
+        if getattr(event, 'is_directory', False):
+            return
+        for path in (getattr(event, 'src_path', None), getattr(event, 'dest_path', None)):
+            if path and path.lower().endswith('.msg'):
+                msg_analyzer.invalidate_file(path)
+
+if Observer is not None:
+    _observer = Observer()
+    _observer.daemon = True
+    _observer.schedule(_MsgFolderWatcher(), BASE_DIR, recursive=True)
+    _observer.start()
+
 # API Routes
 @app.route('/')
 def index():
@@ -284,8 +607,30 @@ def get_processes():
 def get_messages(process_id):
     """Get all messages for a specific process"""
     try:
-        messages = msg_analyzer.get_messages_for_process(process_id)
-        return jsonify(messages)
+        # ?fields=headers skips bodies and attachment enumeration for fast list views
+        include_body = request.args.get('fields') != 'headers'
+
+        # Answer 304 from the folder fingerprint alone when the client is current
+        n_files, newest_mtime_ns = msg_analyzer.get_process_fingerprint(process_id)
+        etag = f"{newest_mtime_ns:x}-{n_files:x}-{'full' if include_body else 'headers'}"
+        if request.if_none_match.contains_weak(etag):
+            return '', 304
+
+        messages = msg_analyzer.get_messages_for_process(process_id, include_body=include_body)
+        response = jsonify(messages)
+        response.set_etag(etag, weak=True)
+        return response
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/message/<process_id>/<message_id>/body', methods=['GET'])
+def get_message_body(process_id, message_id):
+    """Get the full body of a single message on demand"""
+    try:
+        body_data = msg_analyzer.get_message_body(process_id, message_id)
+        return jsonify(body_data)
+    except FileNotFoundError:
+        return jsonify({"error": "Message not found"}), 404
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -293,25 +638,16 @@ def get_messages(process_id):
 def get_attachment(process_id, message_id, attachment_index):
     """Download a specific attachment"""
     try:
-        attachment_path = msg_analyzer.get_attachment(process_id, message_id, attachment_index)
-        
-        if attachment_path and os.path.exists(attachment_path):
-            filename = os.path.basename(attachment_path)
-            
-            # Clean up temporary files after sending
-            @app.after_request
-            def remove_temp_file(response):
-                try:
-                    temp_dir = os.path.dirname(attachment_path)
-                    if os.path.exists(temp_dir):
-                        shutil.rmtree(temp_dir)
-                except:
-                    pass
-                return response
-            
-            return send_file(attachment_path, as_attachment=True, download_name=filename)
-        else:
-            return jsonify({"error": "Attachment not found"}), 404
+        filename, source = msg_analyzer.get_attachment(process_id, message_id, attachment_index)
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+        # Cached payloads are served from disk; fresh extractions stream straight from memory
+        if isinstance(source, bytes):
+            source = io.BytesIO(source)
+
+        return send_file(source, as_attachment=True, download_name=filename, mimetype=mimetype)
+    except (FileNotFoundError, IndexError, ValueError):
+        return jsonify({"error": "Attachment not found"}), 404
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -322,7 +658,7 @@ def update_message_status(process_id, message_id):
         data = request.get_json()
         status = data.get('status')
         
-        if status not in ['keep', 'review', 'untagged']:
+        if status not in VALID_STATUSES:
             return jsonify({"error": "Invalid status"}), 400
         
         success = msg_analyzer.update_message_status(process_id, message_id, status)
@@ -340,10 +676,9 @@ def add_comment(process_id, message_id):
     try:
         data = request.get_json()
         
-        required_fields = ['key', 'labels', 'text']
-        for field in required_fields:
-            if field not in data:
-                return jsonify({"error": f"Missing field: {field}"}), 400
+        missing = REQUIRED_COMMENT_FIELDS - data.keys()
+        if missing:
+            return jsonify({"error": f"Missing field: {sorted(missing)[0]}"}), 400
         
         success = msg_analyzer.add_comment_to_message(process_id, message_id, data)
         
@@ -372,5 +707,6 @@ if __name__ == '__main__':
     print(f"MSG Analyzer Backend starting...")
     print(f"Base folder: {BASE_DIR}")
     print("Available processes:", msg_analyzer.get_processes())
-    
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+
+    # Dev fallback only - run under gunicorn in production (see wsgi.py)
+    app.run(host='0.0.0.0', port=5000, threaded=True)
\ No newline at end of file
@@ -1,35 +1,134 @@
 import http.server
-import socketserver
 import threading
 import webbrowser
 import os
 import json
 import extract_msg
 from datetime import datetime
-import tempfile
+from email.utils import parsedate_to_datetime
 import shutil
-import glob
+import gzip
 from urllib.parse import urlparse, parse_qs
 import html
 import time
 from functools import lru_cache
+from collections import OrderedDict
+import hashlib
 import traceback
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import asyncio
 import re
+import sqlite3
+
+import _fast_msg_reader
+
+try:
+    import orjson  # Rust JSON encoder, ~3-10x faster than stdlib and emits bytes
+except ImportError:
+    orjson = None
+
+def _dumps(data):
+    """Serialize to JSON bytes, preferring orjson when installed."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data).encode('utf-8')
+
+def _loads(data):
+    """Parse JSON from bytes without an intermediate decode."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+# Attachment extension (without dot) -> display type
+_EXT_TYPE_MAP = {
+    'pdf': 'PDF', 'doc': 'Word', 'docx': 'Word',
+    'xls': 'Excel', 'xlsx': 'Excel', 'ppt': 'PowerPoint',
+    'pptx': 'PowerPoint', 'txt': 'Text', 'jpg': 'Image',
+    'jpeg': 'Image', 'png': 'Image', 'gif': 'Image',
+    'zip': 'Archive', 'rar': 'Archive'
+}
+
+@lru_cache(maxsize=64)
+def _ext_to_type(ext):
+    return _EXT_TYPE_MAP.get(ext, 'File')
+
+@lru_cache(maxsize=4096)
+def _parse_date_str(date_str):
+    """Parse a date string to ISO format, or None if unparseable.
+
+    Memoized: identical date strings recur across threaded messages and
+    repeat list loads.
+    """
+    try:
+        # Already-ISO strings short-circuit before the RFC 2822 parser
+        return datetime.fromisoformat(date_str).isoformat()
+    except (TypeError, ValueError):
+        pass
+    try:
+        return parsedate_to_datetime(date_str.split(' (')[0]).isoformat()
+    except (TypeError, ValueError):
+        return None
+
+# Fallback timestamp for missing/unparseable dates, refreshed at 1s
+# granularity so a batch of bad dates shares one datetime.now() call
+_NOW_CACHE = [0.0, '']
+
+def _now_iso():
+    t = time.time()
+    if t - _NOW_CACHE[0] > 1.0:
+        _NOW_CACHE[0] = t
+        _NOW_CACHE[1] = datetime.now().isoformat()
+    return _NOW_CACHE[1]
+
+# Reply/forward prefixes stripped when normalizing subjects into thread ids
+_SUBJECT_PREFIX_RE = re.compile(r'^\s*(re|fw|fwd|tr|aw)\s*:\s*', re.IGNORECASE)
+
+# Markers of an embedded conversation, matched in a single pass over the body
+_THREAD_RE = re.compile(r'original message|forwarded message|from:|sent:|to:|subject:', re.IGNORECASE)
+
+# Whitespace runs collapsed when building body previews
+_WS_RE = re.compile(r'\s+')
+
+# API dispatch table: first matching pattern wins, named groups become
+# handler keyword arguments
+_API_ROUTES = (
+    (re.compile(r'^/api/processes/?$'), 'handle_processes'),
+    (re.compile(r'^/api/messages/(?P<process_id>[^/?]+)/?(?:\?.*)?$'), 'handle_messages_optimized'),
+    (re.compile(r'^/api/message/(?P<process_id>[^/?]+)/(?P<message_id>[^/?]+)/?$'), 'handle_single_message'),
+    (re.compile(r'^/api/attachment/(?P<process_id>[^/?]+)/(?P<message_id>[^/?]+)/(?P<attachment_index>\d+)/?$'), 'handle_attachment'),
+    (re.compile(r'^/api/health/?$'), 'handle_health'),
+)
+
+_API_POST_ROUTES = (
+    (re.compile(r'^/api/message/(?P<process_id>[^/?]+)/(?P<message_id>[^/?]+)/status/?$'), 'handle_update_status'),
+    (re.compile(r'^/api/message/(?P<process_id>[^/?]+)/(?P<message_id>[^/?]+)/comment/?$'), 'handle_add_comment'),
+)
 
 class OptimizedMSGAnalyzer:
     def __init__(self, base_folder="msg_files"):
         self.base_folder = base_folder
         self._ensure_base_folder()
-        self._cache = {}
-        self._cache_time = {}
+        # LRU of (stamp, value): list envelopes + full-content entries
+        self._cache = OrderedDict()
         self.cache_timeout = 300
+        self.cache_limit = 128
         self.message_status = {}
         self.message_comments = {}
-        self.thread_pool = ThreadPoolExecutor(max_workers=4)  # Parallel processing
+        # Parse work is I/O-bound (OLE stream reads), so oversubscribe cores
+        self.thread_pool = ThreadPoolExecutor(max_workers=min((os.cpu_count() or 4) * 2, 16))
         self._message_index = {}  # Quick message lookup
         self._process_metadata = {}  # Store process metadata for faster access
+        self._dir_count_memo = {}  # process path -> (mtime_ns, .msg count)
+        self._header_index = {}  # process path -> (mtime_ns, sorted (path, stat) list)
+        # Parsed list entries: path -> (mtime_ns, size, message dict)
+        self._parsed_file_cache = {}
+        self._open_msg_lru = OrderedDict()  # (path, mtime_ns) -> open Message
+        self._open_msg_lock = threading.Lock()
+        self.open_msg_limit = 32
+        # Coalesces concurrent loads of the same page across server threads
+        self._cache_lock = threading.Lock()
+        self._in_flight = {}  # cache_key -> threading.Event
+        self._init_parse_db()
     
     def _ensure_base_folder(self):
         if not os.path.exists(self.base_folder):
@@ -38,21 +137,35 @@ class OptimizedMSGAnalyzer:
     
     def get_processes(self):
         """Fast process listing - only checks folder structure"""
-        if self._process_metadata and time.time() - self._process_metadata.get('_timestamp', 0) < 60:
+        if self._process_metadata and time.monotonic() - self._process_metadata.get('_timestamp', 0) < 5:
             return self._process_metadata.get('processes', [])
-        
+
         processes = []
         try:
-            for item in os.listdir(self.base_folder):
-                item_path = os.path.join(self.base_folder, item)
-                if os.path.isdir(item_path):
-                    # Fast count - just check for .msg files without parsing
-                    msg_files = [f for f in os.listdir(item_path) if f.lower().endswith('.msg')]
-                    processes.append({
-                        "id": item,
-                        "name": item.replace("_", " ").title(),
-                        "count": len(msg_files)
-                    })
+            with os.scandir(self.base_folder) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False) and not entry.name.startswith('.'):
+                        # Skip the inner scandir when the folder's mtime says
+                        # nothing was added or removed since the last count
+                        dir_mtime = entry.stat().st_mtime_ns
+                        memo = self._dir_count_memo.get(entry.path)
+                        if memo is not None and memo[0] == dir_mtime:
+                            processes.append({
+                                "id": entry.name,
+                                "name": entry.name.replace("_", " ").title(),
+                                "count": memo[1]
+                            })
+                            continue
+                        # Fast count - just check for .msg files without parsing
+                        with os.scandir(entry.path) as files:
+                            count = sum(1 for f in files
+                                        if f.name.lower().endswith('.msg') and f.is_file(follow_symlinks=False))
+                        self._dir_count_memo[entry.path] = (dir_mtime, count)
+                        processes.append({
+                            "id": entry.name,
+                            "name": entry.name.replace("_", " ").title(),
+                            "count": count
+                        })
         except Exception as e:
             print(f"Error reading processes: {e}")
         
@@ -62,7 +175,7 @@ class OptimizedMSGAnalyzer:
         # Cache process metadata
         self._process_metadata = {
             'processes': processes,
-            '_timestamp': time.time()
+            '_timestamp': time.monotonic()
         }
         
         return processes
@@ -76,61 +189,107 @@ class OptimizedMSGAnalyzer:
         return [{"id": folder, "name": folder.replace("_", " ").title(), "count": 0} for folder in sample_folders]
     
     def get_messages_for_process_optimized(self, process_id, limit=50, offset=0):
-        """Optimized message loading with pagination"""
+        """Optimized message loading with pagination
+
+        Concurrent requests for the same page are coalesced: the first one
+        does the parse while the rest wait on its event and read the cache,
+        so a refresh storm never parses the same folder twice in parallel.
+        """
         cache_key = f"messages_{process_id}_{limit}_{offset}"
-        current_time = time.time()
-        
-        if (cache_key in self._cache and 
-            current_time - self._cache_time.get(cache_key, 0) < self.cache_timeout):
-            return self._cache[cache_key]
-        
+
+        while True:
+            with self._cache_lock:
+                entry = self._cache.get(cache_key)
+                if entry is not None and time.time() - entry[0] < self.cache_timeout:
+                    self._cache.move_to_end(cache_key)
+                    return entry[1]
+                event = self._in_flight.get(cache_key)
+                if event is None:
+                    event = threading.Event()
+                    self._in_flight[cache_key] = event
+                    break
+            # Another thread is already loading this page; wait and re-check
+            event.wait(timeout=60)
+
         print(f"Loading messages for {process_id} (limit: {limit}, offset: {offset})")
-        
-        messages = self._load_messages_batch(process_id, limit, offset)
-        
-        self._cache[cache_key] = messages
-        self._cache_time[cache_key] = current_time
-        
+
+        try:
+            messages = self._load_messages_batch(process_id, limit, offset)
+            with self._cache_lock:
+                self._cache_put(cache_key, messages, time.time())
+        finally:
+            with self._cache_lock:
+                self._in_flight.pop(cache_key, None)
+            event.set()
+
         return messages
+
+    def _cache_put(self, cache_key, value, now=None):
+        """Insert into the bounded LRU cache, evicting the oldest entry."""
+        self._cache[cache_key] = (now if now is not None else time.time(), value)
+        self._cache.move_to_end(cache_key)
+        while len(self._cache) > self.cache_limit:
+            self._cache.popitem(last=False)
     
     def _load_messages_batch(self, process_id, limit, offset):
         """Load only a batch of messages"""
         messages = []
+        total_count = 0
         process_path = os.path.join(self.base_folder, process_id)
-        
+
         if not os.path.exists(process_path):
-            return messages
-        
+            return {
+                "messages": messages,
+                "total_count": 0,
+                "has_more": False,
+                "offset": offset,
+                "limit": limit
+            }
+
         try:
-            # Get all .msg files
-            msg_files = glob.glob(os.path.join(process_path, "*.msg"))
-            
-            # Sort by modification time (newest first) for faster access
-            msg_files.sort(key=os.path.getmtime, reverse=True)
-            
-            # Apply pagination
-            batch_files = msg_files[offset:offset + limit]
-            
-            print(f"Processing {len(batch_files)} files out of {len(msg_files)} total")
-            
-            # Use thread pool for parallel processing
-            with ThreadPoolExecutor(max_workers=min(4, len(batch_files))) as executor:
+            msg_files = self._list_msg_files(process_path)
+            total_count = len(msg_files)
+
+            # Apply pagination, re-statting just the page being served:
+            # in-place edits don't bump the directory mtime, so memoized
+            # stat results could otherwise go stale and pin old parses
+            batch_files = []
+            for msg_file, _ in msg_files[offset:offset + limit]:
+                try:
+                    batch_files.append((msg_file, os.stat(msg_file)))
+                except OSError:
+                    continue  # deleted since the listing was memoized
+
+            print(f"Processing {len(batch_files)} files out of {total_count} total")
+
+            # One SELECT covers the whole page's index rows
+            index_rows = self._index_lookup([msg_file for msg_file, _ in batch_files])
+
+            # Tell the kernel about the whole page up front so cold-cache
+            # reads overlap with parsing instead of faulting one by one
+            self._prefetch(msg_file for msg_file, _ in batch_files
+                           if msg_file not in index_rows)
+
+            if len(batch_files) < 4:
+                # Pool overhead dominates for tiny batches
+                parsed = (self._parse_msg_cached(msg_file, process_id, st, index_rows)
+                          for msg_file, st in batch_files)
+                for message_data in parsed:
+                    if message_data:
+                        self._apply_saved_state(message_data)
+                        messages.append(message_data)
+            else:
+                # Parse on the shared pool; collect results as they complete
                 future_to_file = {
-                    executor.submit(self._parse_msg_file_fast, msg_file, process_id): msg_file 
-                    for msg_file in batch_files
+                    self.thread_pool.submit(self._parse_msg_cached, msg_file, process_id, st, index_rows): msg_file
+                    for msg_file, st in batch_files
                 }
-                
-                for future in future_to_file:
+
+                for future in as_completed(future_to_file):
                     try:
                         message_data = future.result(timeout=10)  # 10 second timeout per file
                         if message_data:
-                            # Apply saved status and comments
-                            message_id = message_data["id"]
-                            if message_id in self.message_status:
-                                message_data["status"] = self.message_status[message_id]
-                            if message_id in self.message_comments:
-                                message_data["comments"] = self.message_comments[message_id]
-                            
+                            self._apply_saved_state(message_data)
                             messages.append(message_data)
                     except Exception as e:
                         msg_file = future_to_file[future]
@@ -145,20 +304,179 @@ class OptimizedMSGAnalyzer:
         
         return {
             "messages": messages,
-            "total_count": len(glob.glob(os.path.join(process_path, "*.msg"))),
-            "has_more": (offset + limit) < len(glob.glob(os.path.join(process_path, "*.msg"))),
+            "total_count": total_count,
+            "has_more": (offset + limit) < total_count,
             "offset": offset,
             "limit": limit
         }
     
+    def _prefetch(self, paths):
+        """Hint the kernel to read a batch of files ahead of parsing.
+
+        POSIX_FADV_WILLNEED returns immediately and queues readahead, so
+        disk I/O for later files overlaps with parsing the earlier ones.
+        No-op where the advice call is unavailable.
+        """
+        if not hasattr(os, 'posix_fadvise'):
+            return
+        for path in paths:
+            try:
+                fd = os.open(path, os.O_RDONLY)
+                try:
+                    os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+                finally:
+                    os.close(fd)
+            except OSError:
+                continue
+
+    def _list_msg_files(self, process_path):
+        """Sorted (path, stat) listing, memoized against the directory mtime.
+
+        Pagination slices this list on every request; re-listing and
+        re-sorting an unchanged folder per page was pure overhead. Adds or
+        removals bump the directory mtime and rebuild the memo. The
+        memoized stat results are only trusted for ordering and counting —
+        callers must re-stat the entries they actually serve, since
+        in-place edits change a file's mtime without touching the
+        directory's.
+        """
+        dir_mtime = os.stat(process_path).st_mtime_ns
+        memo = self._header_index.get(process_path)
+        if memo is not None and memo[0] == dir_mtime:
+            return memo[1]
+
+        # One scandir pass gives the file list plus cached stat data
+        with os.scandir(process_path) as it:
+            msg_files = [(entry.path, entry.stat())
+                         for entry in it
+                         if entry.name.lower().endswith('.msg') and entry.is_file(follow_symlinks=False)]
+
+        # Sort by modification time (newest first) for faster access
+        msg_files.sort(key=lambda pair: pair[1].st_mtime, reverse=True)
+        self._header_index[process_path] = (dir_mtime, msg_files)
+        return msg_files
+
+    def _apply_saved_state(self, message_data):
+        """Overlay saved status and comments onto a freshly parsed message"""
+        message_id = message_data["id"]
+        if message_id in self.message_status:
+            message_data["status"] = self.message_status[message_id]
+        if message_id in self.message_comments:
+            message_data["comments"] = self.message_comments[message_id]
+        # Reverse index so mutations can reach the cached dict in O(1)
+        self._message_index[message_id] = message_data
+
+    def _parse_msg_cached(self, file_path, process_id, st, index_rows=None):
+        """Parse a .msg, reusing memory then on-disk index while unchanged.
+
+        Keyed by (mtime_ns, size) so edited files reparse; the sqlite
+        level means a restart skips the OLE parse for every unchanged
+        file. index_rows, when given, is a prefetched {path: row} dict so
+        a whole page costs one SELECT instead of one per file.
+        """
+        cached = self._parsed_file_cache.get(file_path)
+        if cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            return cached[2]
+
+        if index_rows is not None:
+            row = index_rows.get(file_path)
+        else:
+            row = self._index_lookup([file_path]).get(file_path)
+
+        message_data = None
+        if row is not None and row[0] == st.st_mtime_ns and row[1] == st.st_size:
+            message_data = row[2]
+        if message_data is None:
+            message_data = self._parse_msg_file_fast(file_path, process_id)
+            if message_data:
+                self._index_store(file_path, st, message_data)
+
+        if message_data:
+            self._parsed_file_cache[file_path] = (st.st_mtime_ns, st.st_size, message_data)
+        return message_data
+
+    def _init_parse_db(self):
+        """Open the sqlite parse index; disable it on any failure."""
+        try:
+            db_dir = os.path.join(self.base_folder, ".cache")
+            os.makedirs(db_dir, exist_ok=True)
+            db = sqlite3.connect(os.path.join(db_dir, "parsed.sqlite"),
+                                 check_same_thread=False)
+            # WAL keeps readers unblocked while parse results stream in
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            db.execute('CREATE TABLE IF NOT EXISTS msg_meta ('
+                       'path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, '
+                       'date TEXT, message BLOB)')
+            db.commit()
+            self._parse_db = db
+        except Exception as e:
+            print(f"Parse index unavailable: {e}")
+            self._parse_db = None
+        self._parse_db_lock = threading.Lock()
+
+    def _index_lookup(self, paths):
+        """Fetch index rows for a batch of paths in one SELECT.
+
+        Returns {path: (mtime_ns, size, message dict)} for rows found.
+        """
+        if self._parse_db is None or not paths:
+            return {}
+        try:
+            placeholders = ','.join('?' * len(paths))
+            with self._parse_db_lock:
+                rows = self._parse_db.execute(
+                    f'SELECT path, mtime_ns, size, message FROM msg_meta '
+                    f'WHERE path IN ({placeholders})', list(paths)).fetchall()
+            return {path: (mtime_ns, size, _loads(blob))
+                    for path, mtime_ns, size, blob in rows}
+        except Exception as e:
+            print(f"Error reading parse index: {e}")
+            return {}
+
+    def _index_store(self, file_path, st, message_data):
+        if self._parse_db is None:
+            return
+        try:
+            with self._parse_db_lock:
+                self._parse_db.execute(
+                    'INSERT OR REPLACE INTO msg_meta VALUES (?, ?, ?, ?, ?)',
+                    (file_path, st.st_mtime_ns, st.st_size,
+                     message_data.get("date"), _dumps(message_data)))
+                self._parse_db.commit()
+        except Exception as e:
+            print(f"Error writing parse index for {file_path}: {e}")
+
     def _parse_msg_file_fast(self, file_path, process_id):
         """Fast parsing - only essential fields"""
+        # Header-only read straight from the OLE streams when olefile is
+        # available; skips extract_msg's full object tree on the list path
+        headers = _fast_msg_reader.read_headers(file_path)
+        if headers is not None:
+            subject = headers["subject"] or "No Subject"
+            sender = headers["sender"] or "Unknown Sender"
+            filename = os.path.basename(file_path)
+            message_id = f"{process_id}_{os.path.splitext(filename)[0]}"
+            return {
+                "id": message_id,
+                "subject": subject,
+                "from": sender,
+                "subject_html": html.escape(subject, quote=True),
+                "from_html": html.escape(sender, quote=True),
+                "date": headers["date"] or _now_iso(),
+                "body_preview": self._get_body_preview(headers["body"]),
+                "status": "untagged",
+                "filename": filename,
+                "has_attachments": headers["has_attachments"],
+                "needs_full_parse": True
+            }
+
         try:
             msg = extract_msg.Message(file_path)
         except Exception as e:
             print(f"Error opening msg file {file_path}: {e}")
             return None
-            
+
         try:
             # Fast parsing - only get essential metadata first
             subject = msg.subject or "No Subject"
@@ -168,13 +486,21 @@ class OptimizedMSGAnalyzer:
             filename = os.path.basename(file_path)
             message_id = f"{process_id}_{os.path.splitext(filename)[0]}"
             
-            # Get basic body preview (first 200 chars)
-            body_preview = self._get_body_preview(msg)
+            # Read the body stream once; preview works from the local copy
+            try:
+                body = msg.body or ""
+            except:
+                body = ""
+            body_preview = self._get_body_preview(body)
             
             message_data = {
                 "id": message_id,
                 "subject": subject,
                 "from": sender,
+                # Pre-escaped once at parse time so the client can skip
+                # per-render escaping before innerHTML interpolation
+                "subject_html": html.escape(subject, quote=True),
+                "from_html": html.escape(sender, quote=True),
                 "date": date,
                 "body_preview": body_preview,
                 "status": "untagged",
@@ -197,10 +523,13 @@ class OptimizedMSGAnalyzer:
     def get_message_full_content(self, process_id, message_id):
         """Load full content only when needed"""
         cache_key = f"full_{message_id}"
-        if cache_key in self._cache:
-            return self._cache[cache_key]
+        with self._cache_lock:
+            entry = self._cache.get(cache_key)
+            if entry is not None:
+                self._cache.move_to_end(cache_key)
+                return entry[1]
         
-        original_msg_id = message_id.replace(f"{process_id}_", "")
+        original_msg_id = message_id.removeprefix(f"{process_id}_")
         msg_file_path = os.path.join(self.base_folder, process_id, f"{original_msg_id}.msg")
         
         if not os.path.exists(msg_file_path):
@@ -214,24 +543,28 @@ class OptimizedMSGAnalyzer:
             recipients = self._parse_recipients(msg)
             date = self._parse_date_fast(msg.date)
             
-            # Get full body content
-            body = ""
-            body_type = "text"
-            if hasattr(msg, 'htmlBody') and msg.htmlBody:
-                body = msg.htmlBody
+            # Snapshot each body stream at most once; every extract_msg
+            # property access can decode the OLE stream again
+            text_body = msg.body or ""
+            html_body = getattr(msg, 'htmlBody', None)
+            if html_body:
+                body = html_body
                 body_type = "html"
             else:
-                body = msg.body or ""
+                body = text_body
                 body_type = "text"
-            
+
             attachments = self._extract_attachments(msg, message_id)
-            thread_info = self._parse_thread_info(msg, subject)
+            thread_info = self._parse_thread_info(subject, text_body)
             
             message_data = {
                 "id": message_id,
                 "subject": subject,
                 "from": sender,
                 "to": recipients,
+                "subject_html": html.escape(subject, quote=True),
+                "from_html": html.escape(sender, quote=True),
+                "to_html": html.escape(recipients, quote=True),
                 "date": date,
                 "body": body,
                 "body_type": body_type,
@@ -244,8 +577,8 @@ class OptimizedMSGAnalyzer:
             }
             
             # Cache full content
-            self._cache[cache_key] = message_data
-            self._cache_time[cache_key] = time.time()
+            with self._cache_lock:
+                self._cache_put(cache_key, message_data)
             
             return message_data
             
@@ -268,27 +601,22 @@ class OptimizedMSGAnalyzer:
     def _parse_date_fast(self, date_str):
         """Fast date parsing"""
         if not date_str:
-            return datetime.now().isoformat()
-        
-        try:
-            # Try simple parsing first
-            for fmt in ['%a, %d %b %Y %H:%M:%S %z', '%Y-%m-%d %H:%M:%S']:
-                try:
-                    dt = datetime.strptime(date_str.split(' (')[0], fmt)
-                    return dt.isoformat()
-                except ValueError:
-                    continue
-            return datetime.now().isoformat()
-        except:
-            return datetime.now().isoformat()
+            return _now_iso()
+
+        # Newer extract_msg versions already return a datetime
+        if isinstance(date_str, datetime):
+            return date_str.isoformat()
+
+        parsed = _parse_date_str(date_str)
+        return parsed if parsed is not None else _now_iso()
     
-    def _get_body_preview(self, msg):
-        """Get body preview without full parsing"""
+    def _get_body_preview(self, body):
+        """Get a short preview from an already-read body string"""
         try:
-            if hasattr(msg, 'body') and msg.body:
-                body = msg.body
-                # Clean and truncate
-                cleaned = re.sub(r'\s+', ' ', body.strip())
+            if body:
+                # Truncate before cleaning: only 200 chars survive, so
+                # collapsing whitespace across a megabyte body is wasted work
+                cleaned = _WS_RE.sub(' ', body[:2048].strip())
                 return cleaned[:200] + ('...' if len(cleaned) > 200 else '')
             return ""
         except:
@@ -296,90 +624,196 @@ class OptimizedMSGAnalyzer:
     
     def _parse_recipients(self, msg):
         """Parse recipients (only when full content needed)"""
-        recipients = []
-        
         try:
-            if hasattr(msg, 'to') and msg.to:
-                recipients.extend([r.strip() for r in msg.to.split(';')])
-            
-            if hasattr(msg, 'cc') and msg.cc:
-                recipients.extend([r.strip() for r in msg.cc.split(';')])
-            
-            if hasattr(msg, 'bcc') and msg.bcc:
-                recipients.extend([r.strip() for r in msg.bcc.split(';')])
+            # Single fused pass: no intermediate joined string or lists
+            recipients = ', '.join(
+                r.strip()
+                for raw in (getattr(msg, field, None) for field in ('to', 'cc', 'bcc'))
+                if raw
+                for r in raw.split(';')
+                if r.strip()
+            )
+            return recipients or "No Recipients"
         except:
-            pass
-        
-        return ', '.join(recipients) if recipients else "No Recipients"
-    
+            return "No Recipients"
+
     def _extract_attachments(self, msg, message_id):
         """Extract attachments (only when full content needed)"""
-        attachments = []
-        
         try:
-            if hasattr(msg, 'attachments') and msg.attachments:
-                for i, attachment in enumerate(msg.attachments):
-                    if hasattr(attachment, 'longFilename') and attachment.longFilename:
-                        attachments.append({
-                            "name": attachment.longFilename,
-                            "url": f"/api/attachment/{message_id}/{i}",
-                            "type": self._get_attachment_type(attachment.longFilename)
-                        })
+            return [
+                {
+                    "name": attachment.longFilename,
+                    "url": f"/api/attachment/{message_id}/{i}",
+                    "type": self._get_attachment_type(attachment.longFilename)
+                }
+                for i, attachment in enumerate(getattr(msg, 'attachments', None) or [])
+                if getattr(attachment, 'longFilename', None)
+            ]
         except Exception as e:
             print(f"Error extracting attachments: {e}")
-        
-        return attachments
+            return []
     
     def _get_attachment_type(self, filename):
-        ext = os.path.splitext(filename)[1].lower()
-        type_map = {
-            '.pdf': 'PDF', '.doc': 'Word', '.docx': 'Word',
-            '.xls': 'Excel', '.xlsx': 'Excel', '.ppt': 'PowerPoint',
-            '.pptx': 'PowerPoint', '.txt': 'Text', '.jpg': 'Image',
-            '.jpeg': 'Image', '.png': 'Image', '.gif': 'Image',
-            '.zip': 'Archive', '.rar': 'Archive'
-        }
-        return type_map.get(ext, 'File')
+        return _ext_to_type(filename.rpartition('.')[2].lower())
     
-    def _parse_thread_info(self, msg, subject):
-        thread_id = f"thread_{hash(subject) % 10000}"
-        
-        contains_thread = False
-        
-        try:
-            if hasattr(msg, 'body') and msg.body:
-                body_lower = msg.body.lower()
-                thread_indicators = ['original message', 'forwarded message', 'from:', 'sent:', 'to:', 'subject:']
-                contains_thread = any(indicator in body_lower for indicator in thread_indicators)
-        except:
-            pass
-        
+    def _parse_thread_info(self, subject, body=""):
+        # Normalize away reply/forward prefixes so "RE: RE: Foo" and "Foo"
+        # land in the same thread, then hash deterministically: the builtin
+        # hash() is salted per process, so ids would change on every restart
+        normalized = subject or ""
+        while True:
+            stripped = _SUBJECT_PREFIX_RE.sub('', normalized, count=1)
+            if stripped == normalized:
+                break
+            normalized = stripped
+        normalized = ' '.join(normalized.casefold().split())
+        digest = hashlib.blake2b(normalized.encode('utf-8'), digest_size=8).hexdigest()
+        thread_id = f"thread_{digest}"
+
+        # Quoted-reply markers appear near the top of the body;
+        # scanning megabytes of trailing HTML adds nothing
+        contains_thread = bool(body) and _THREAD_RE.search(body[:2048]) is not None
+
         return {
             "thread_id": thread_id,
             "contains_thread": contains_thread
         }
     
-    # Keep existing methods for attachment, status, comments...
+    def _open_msg_cached(self, file_path):
+        """Return an open Message from a bounded LRU keyed by path and mtime.
+
+        Re-opening a .msg re-parses the whole OLE container just to reach
+        one attachment; while the UI is browsing a message, downloads hit
+        the same file repeatedly. Evicted handles are closed.
+        """
+        key = (file_path, os.stat(file_path).st_mtime_ns)
+        with self._open_msg_lock:
+            msg = self._open_msg_lru.get(key)
+            if msg is not None:
+                self._open_msg_lru.move_to_end(key)
+                return msg
+
+        msg = extract_msg.Message(file_path)
+        with self._open_msg_lock:
+            self._open_msg_lru[key] = msg
+            self._open_msg_lru.move_to_end(key)
+            while len(self._open_msg_lru) > self.open_msg_limit:
+                _, evicted = self._open_msg_lru.popitem(last=False)
+                try:
+                    evicted.close()
+                except:
+                    pass
+        return msg
+
     def get_attachment(self, process_id, message_id, attachment_index):
-        # ... (same as before)
-        pass
+        """Extract an attachment payload into the cache folder and return (name, path)"""
+        cache_dir = os.path.join(self.base_folder, ".cache", "attachments", message_id)
+        prefix = f"{attachment_index}_"
+
+        # Reuse a payload extracted on a previous download
+        if os.path.isdir(cache_dir):
+            with os.scandir(cache_dir) as it:
+                for entry in it:
+                    if entry.name.startswith(prefix):
+                        return entry.name[len(prefix):], entry.path
+
+        original_msg_id = message_id.removeprefix(f"{process_id}_")
+        msg_file_path = os.path.join(self.base_folder, process_id, f"{original_msg_id}.msg")
+
+        if not os.path.exists(msg_file_path):
+            raise FileNotFoundError(f"Message file not found: {msg_file_path}")
+
+        # Kept open in the LRU; closed on eviction rather than per request
+        msg = self._open_msg_cached(msg_file_path)
+        attachments = getattr(msg, 'attachments', None) or []
+        if not 0 <= attachment_index < len(attachments):
+            raise IndexError(f"Attachment index {attachment_index} out of range")
+
+        attachment = attachments[attachment_index]
+        name = os.path.basename(attachment.longFilename or f"attachment_{attachment_index}")
+        data = attachment.data
+
+        # Write-through so repeat downloads hit the sendfile path,
+        # but serve this request straight from memory
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            with open(os.path.join(cache_dir, prefix + name), 'wb') as f:
+                f.write(data)
+        except OSError as e:
+            print(f"Error caching attachment payload: {e}")
+
+        return name, data
     
     def update_message_status(self, process_id, message_id, status):
-        # ... (same as before)
-        pass
-    
+        try:
+            # Patch the cached copies in place instead of invalidating:
+            # the next list request keeps serving without a re-parse
+            with self._cache_lock:
+                self.message_status[message_id] = status
+                self._patch_cached_message(message_id, "status", status)
+            return True
+        except Exception as e:
+            print(f"Error updating status: {e}")
+            return False
+
     def add_comment_to_message(self, process_id, message_id, comment_data):
-        # ... (same as before)
-        pass
+        try:
+            comment_data["date"] = datetime.now().isoformat()
+            with self._cache_lock:
+                comments = self.message_comments.setdefault(message_id, [])
+                comments.append(comment_data)
+                self._patch_cached_message(message_id, "comments", comments)
+            return True
+        except Exception as e:
+            print(f"Error adding comment: {e}")
+            return False
+
+    def _patch_cached_message(self, message_id, field, value):
+        """O(1) in-place update of every cached copy of a message.
+
+        List envelopes share the dict held in _message_index, so patching
+        that one object updates all cached pages containing it; the full-
+        content entry is a separate dict and is patched alongside.
+        """
+        indexed = self._message_index.get(message_id)
+        if indexed is not None:
+            indexed[field] = value
+        full = self._cache.get(f"full_{message_id}")
+        if full is not None:
+            full[1][field] = value
     
     def clear_cache(self):
-        self._cache.clear()
-        self._cache_time.clear()
+        with self._cache_lock:
+            self._cache.clear()
 
 # Create optimized analyzer
 analyzer = OptimizedMSGAnalyzer()
 
+class _ChunkSink:
+    """File-like adapter that frames writes as HTTP chunks.
+
+    Lets gzip.GzipFile stream compressed output straight onto a chunked
+    response without buffering it first.
+    """
+    def __init__(self, handler):
+        self.handler = handler
+
+    def write(self, data):
+        if data:
+            self.handler._write_chunk(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
 class OptimizedMSGHandler(http.server.SimpleHTTPRequestHandler):
+    # Content-Length is set on every response, so keep-alive connections can be reused
+    protocol_version = "HTTP/1.1"
+    # Buffer wfile so headers and the three writes per chunk frame leave in
+    # batched send()s instead of one syscall each; handle_one_request
+    # flushes after every response
+    wbufsize = 16 * 1024
+
     def do_GET(self):
         if self.path.startswith('/api/'):
             self.handle_api_request()
@@ -393,36 +827,89 @@ class OptimizedMSGHandler(http.server.SimpleHTTPRequestHandler):
             self.send_error(404, "Endpoint not found")
     
     def serve_html(self):
-        # ... (same as before)
-        pass
+        if _INDEX_HTML is None:
+            self.send_error(404, "index.html not found")
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(_INDEX_HTML)))
+        self.end_headers()
+        self.wfile.write(_INDEX_HTML)
     
     def handle_api_request(self):
         try:
-            if self.path == '/api/processes':
-                self.handle_processes()
-            elif self.path.startswith('/api/messages/'):
-                self.handle_messages_optimized()
-            elif self.path.startswith('/api/message/'):
-                self.handle_single_message()
-            elif self.path.startswith('/api/attachment/'):
-                self.handle_attachment()
-            elif self.path == '/api/health':
-                self.handle_health()
-            else:
-                self.send_error(404, "API endpoint not found")
+            for pattern, handler_name in _API_ROUTES:
+                match = pattern.match(self.path)
+                if match:
+                    getattr(self, handler_name)(**match.groupdict())
+                    return
+            self.send_error(404, "API endpoint not found")
         except Exception as e:
             print(f"API error: {e}")
             self.send_error(500, f"Server error: {str(e)}")
     
-    def handle_messages_optimized(self):
+    def handle_processes(self):
+        self.send_json_response(analyzer.get_processes())
+
+    def handle_health(self):
+        self.send_json_response({"status": "ok", "timestamp": _now_iso()})
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii'))
+        self.wfile.write(data)
+        self.wfile.write(b"\r\n")
+
+    def _client_accepts_gzip(self):
+        return 'gzip' in self.headers.get('Accept-Encoding', '')
+
+    def send_json_stream(self, meta, messages):
+        """Stream a message list as chunked JSON.
+
+        Each message object is encoded and written individually, so the full
+        serialized list never has to sit in memory at once. Output is gzipped
+        on the fly when the client advertises support.
+        """
+        compress = self._client_accepts_gzip()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.send_header('Vary', 'Accept-Encoding')
+        if compress:
+            self.send_header('Content-Encoding', 'gzip')
+        self.end_headers()
+
+        out = _ChunkSink(self)
+        if compress:
+            out = gzip.GzipFile(fileobj=out, mode='wb', compresslevel=1)
+
+        out.write(b'{"messages":[')
+        for i, message in enumerate(messages):
+            piece = _dumps(message)
+            out.write(b',' + piece if i else piece)
+        # Close the array and splice in the pagination metadata
+        out.write(b'],' + _dumps(meta)[1:] if meta else b']}')
+        if compress:
+            out.close()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def send_json_response(self, data, status=200):
+        body = _dumps(data)
+        encoding = None
+        # Tiny payloads aren't worth the deflate round-trip
+        if len(body) >= 1024 and self._client_accepts_gzip():
+            body = gzip.compress(body, compresslevel=1)
+            encoding = 'gzip'
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Vary', 'Accept-Encoding')
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def handle_messages_optimized(self, process_id):
         """Handle optimized messages endpoint with pagination"""
-        path_parts = self.path.split('/')
-        process_id = path_parts[3] if len(path_parts) > 3 else None
-        
-        if not process_id:
-            self.send_error(400, "Process ID required")
-            return
-        
         # Parse query parameters for pagination
         query = urlparse(self.path).query
         params = parse_qs(query)
@@ -431,21 +918,14 @@ class OptimizedMSGHandler(http.server.SimpleHTTPRequestHandler):
         
         try:
             messages_data = analyzer.get_messages_for_process_optimized(process_id, limit, offset)
-            self.send_json_response(messages_data)
+            meta = {key: value for key, value in messages_data.items() if key != 'messages'}
+            self.send_json_stream(meta, messages_data['messages'])
         except Exception as e:
             print(f"Error in handle_messages: {e}")
             self.send_error(500, f"Error retrieving messages: {str(e)}")
     
-    def handle_single_message(self):
+    def handle_single_message(self, process_id, message_id):
         """Handle request for a single message's full content"""
-        path_parts = self.path.split('/')
-        if len(path_parts) < 5:
-            self.send_error(400, "Invalid message URL")
-            return
-        
-        process_id = path_parts[3]
-        message_id = path_parts[4]
-        
         try:
             full_message = analyzer.get_message_full_content(process_id, message_id)
             if full_message:
@@ -455,15 +935,106 @@ class OptimizedMSGHandler(http.server.SimpleHTTPRequestHandler):
         except Exception as e:
             print(f"Error loading full message: {e}")
             self.send_error(500, f"Error loading message: {str(e)}")
-    
-    # ... (keep other methods the same)
+
+    def handle_attachment(self, process_id, message_id, attachment_index):
+        """Stream an attachment to the client without buffering it in memory"""
+        attachment_index = int(attachment_index)  # route pattern guarantees digits
+
+        try:
+            filename, source = analyzer.get_attachment(process_id, message_id, attachment_index)
+        except (FileNotFoundError, IndexError, ValueError) as e:
+            self.send_error(404, str(e))
+            return
+        except Exception as e:
+            print(f"Error extracting attachment: {e}")
+            self.send_error(500, f"Error with attachment: {str(e)}")
+            return
+
+        size = len(source) if isinstance(source, bytes) else os.path.getsize(source)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Disposition', f'attachment; filename="{filename}"')
+        self.send_header('Content-Length', str(size))
+        self.end_headers()
+
+        if isinstance(source, bytes):
+            # Freshly extracted payload: send from memory in bounded chunks
+            view = memoryview(source)
+            for start in range(0, size, 64 * 1024):
+                self.wfile.write(view[start:start + 64 * 1024])
+        else:
+            # sendfile writes to the socket fd directly, bypassing the
+            # buffered wfile; flush so the headers go out first
+            self.wfile.flush()
+            with open(source, 'rb') as f:
+                offset = 0
+                try:
+                    # Zero-copy kernel-to-socket transfer where available;
+                    # sendfile may send short, so drive it to completion
+                    while offset < size:
+                        sent = os.sendfile(self.wfile.fileno(), f.fileno(), offset, size - offset)
+                        if sent == 0:
+                            break
+                        offset += sent
+                except (AttributeError, OSError):
+                    f.seek(offset)
+                    shutil.copyfileobj(f, self.wfile, 1024 * 1024)
+
+    def handle_api_post(self):
+        try:
+            # Control endpoints only carry tiny JSON payloads; reject
+            # oversized bodies outright — truncating the read would leave
+            # the remainder on the socket to desync the next keep-alive
+            # request
+            content_length = int(self.headers.get('Content-Length', 0))
+            if content_length > (1 << 20):
+                self.close_connection = True
+                self.send_error(413, "Request body too large")
+                return
+            post_data = self.rfile.read(content_length) if content_length > 0 else b'{}'
+
+            for pattern, handler_name in _API_POST_ROUTES:
+                match = pattern.match(self.path)
+                if match:
+                    getattr(self, handler_name)(post_data=post_data, **match.groupdict())
+                    return
+            self.send_error(404, "API endpoint not found")
+        except Exception as e:
+            print(f"API POST error: {e}")
+            self.send_error(500, f"Server error: {str(e)}")
+
+    def handle_update_status(self, process_id, message_id, post_data):
+        data = _loads(post_data)
+        status = data.get('status')
+        if status not in ('keep', 'review', 'untagged'):
+            self.send_error(400, "Invalid status")
+            return
+        if analyzer.update_message_status(process_id, message_id, status):
+            self.send_json_response({"message": "Status updated successfully"})
+        else:
+            self.send_error(500, "Failed to update status")
+
+    def handle_add_comment(self, process_id, message_id, post_data):
+        data = _loads(post_data)
+        if analyzer.add_comment_to_message(process_id, message_id, data):
+            self.send_json_response({"message": "Comment added successfully"})
+        else:
+            self.send_error(500, "Failed to add comment")
+
+# index.html is read and encoded once at startup instead of on every request
+_INDEX_HTML = None
 
 def start_server(port=8000):
-    if not os.path.exists('index.html'):
+    global _INDEX_HTML
+    try:
+        with open('index.html', 'rb') as f:
+            _INDEX_HTML = f.read()
+    except OSError:
         print("❌ ERROR: index.html not found!")
         return
-    
-    with socketserver.TCPServer(("", port), OptimizedMSGHandler) as httpd:
+
+    with http.server.ThreadingHTTPServer(("", port), OptimizedMSGHandler) as httpd:
+        httpd.daemon_threads = True
         print(f"🚀 OPTIMIZED MSG Analyzer started on http://localhost:{port}")
         print("⚡ Performance: Lazy loading + Parallel processing + Pagination")
         print("⏹️  To stop: Ctrl+C")
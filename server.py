@@ -1,58 +1,158 @@
 import http.server
-import socketserver
+import threading
 import webbrowser
 import os
+import gzip
 import json
 import time
-import glob
+import hashlib
+import re
+import sqlite3
 from urllib.parse import urlparse, parse_qs
 import traceback
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+try:
+    import orjson  # C JSON codec: emits/accepts bytes directly, 2-5x faster
+except ImportError:
+    orjson = None
+
+try:
+    import brotli  # denser than gzip at comparable encode cost when present
+except ImportError:
+    brotli = None
+
+def _dumps(data):
+    """Serialize to JSON bytes, preferring orjson when installed."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+def _loads(data):
+    """Parse JSON from bytes without an intermediate decode."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+# Timestamp strings only need second granularity; cache the formatted
+# value so hot paths (health probes, comment stamps) skip the
+# localtime + strftime round-trip
+_NOW_CACHE = [0.0, '']
+
+def _now_iso():
+    t = time.time()
+    if t - _NOW_CACHE[0] > 1.0:
+        _NOW_CACHE[0] = t
+        _NOW_CACHE[1] = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(t))
+    return _NOW_CACHE[1]
+
+# Reply/forward prefixes stripped when normalizing subjects into thread ids
+_SUBJ_PREFIX_RE = re.compile(r'^\s*(re|fw|fwd|tr|aw)\s*:\s*', re.IGNORECASE)
+
+def _thread_id(subject):
+    """Stable thread id from a normalized subject.
+
+    The builtin hash() is salted per process, so ids based on it change on
+    every restart; normalizing strips "RE:"/"FW:" chains so replies land in
+    the same thread as the original.
+    """
+    normalized = subject or ""
+    while True:
+        stripped = _SUBJ_PREFIX_RE.sub('', normalized, count=1)
+        if stripped == normalized:
+            break
+        normalized = stripped
+    normalized = ' '.join(normalized.casefold().split())
+    digest = hashlib.blake2b(normalized.encode('utf-8'), digest_size=8).hexdigest()
+    return f"thread_{digest}"
 
 class OptimizedMSGAnalyzer:
     def __init__(self, base_folder="msg_files"):
         self.base_folder = base_folder
         self._ensure_base_folder()
         self._cache = {}
-        self._cache_time = {}
-        self.cache_timeout = 300
+        # Per-file message cache: path -> (mtime_ns, size, message dict)
+        self._file_cache = {}
+        self.file_cache_limit = 10000
         self.message_status = {}
         self.message_comments = {}
-        self.thread_pool = ThreadPoolExecutor(max_workers=4)
+        # Parse work is I/O-bound (OLE stream reads), so oversubscribe cores
+        self.thread_pool = ThreadPoolExecutor(max_workers=min((os.cpu_count() or 4) * 2, 16))
         self._process_metadata = {}
+        # process path -> (mtime_ns, .msg count)
+        self._dir_count_memo = {}
+        # Serializes cache/status/comment mutations across request threads
+        self._lock = threading.RLock()
+        self._init_db()
     
     def _ensure_base_folder(self):
         if not os.path.exists(self.base_folder):
             os.makedirs(self.base_folder)
             print(f"Created base folder: {self.base_folder}")
+
+    def _init_db(self):
+        """Open the status/comment store and warm the in-memory overlays.
+
+        Statuses and comments used to live only in instance dicts and were
+        lost on restart. They are mirrored in a small SQLite file (WAL mode
+        for concurrent readers); the dicts stay as the hot read path.
+        """
+        self._db = None
+        try:
+            db_path = os.path.join(self.base_folder, 'msg_meta.sqlite')
+            self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.execute('CREATE TABLE IF NOT EXISTS status(mid TEXT PRIMARY KEY, status TEXT)')
+            self._db.execute('CREATE TABLE IF NOT EXISTS comments(mid TEXT, data TEXT)')
+
+            for mid, status in self._db.execute('SELECT mid, status FROM status'):
+                self.message_status[mid] = status
+            for mid, data in self._db.execute('SELECT mid, data FROM comments ORDER BY rowid'):
+                self.message_comments.setdefault(mid, []).append(json.loads(data))
+        except Exception as e:
+            print(f"Error opening metadata store (falling back to memory only): {e}")
+            self._db = None
     
     def get_processes(self):
         """Fast process listing"""
-        if self._process_metadata and time.time() - self._process_metadata.get('_timestamp', 0) < 60:
+        if self._process_metadata and time.monotonic() - self._process_metadata.get('_timestamp', 0) < 5:
             return self._process_metadata.get('processes', [])
-        
+
         processes = []
         try:
-            for item in os.listdir(self.base_folder):
-                item_path = os.path.join(self.base_folder, item)
-                if os.path.isdir(item_path):
-                    msg_files = [f for f in os.listdir(item_path) if f.lower().endswith('.msg')]
-                    processes.append({
-                        "id": item,
-                        "name": item.replace("_", " ").title(),
-                        "count": len(msg_files)
-                    })
+            # One scandir pass per directory; DirEntry gives type info without
+            # an extra stat per entry
+            with os.scandir(self.base_folder) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False) and not entry.name.startswith('.'):
+                        # Skip the inner scandir when the folder's mtime says
+                        # nothing was added or removed since the last count
+                        dir_mtime = entry.stat().st_mtime_ns
+                        memo = self._dir_count_memo.get(entry.path)
+                        if memo is not None and memo[0] == dir_mtime:
+                            count = memo[1]
+                        else:
+                            with os.scandir(entry.path) as files:
+                                count = sum(1 for f in files
+                                            if f.name.lower().endswith('.msg') and f.is_file(follow_symlinks=False))
+                            self._dir_count_memo[entry.path] = (dir_mtime, count)
+                        processes.append({
+                            "id": entry.name,
+                            "name": entry.name.replace("_", " ").title(),
+                            "count": count
+                        })
         except Exception as e:
             print(f"Error reading processes: {e}")
-        
+
         if not processes:
             processes = self._create_sample_structure()
-        
+
         self._process_metadata = {
             'processes': processes,
-            '_timestamp': time.time()
+            '_timestamp': time.monotonic()
         }
-        
+
         return processes
     
     def _create_sample_structure(self):
@@ -66,24 +166,36 @@ class OptimizedMSGAnalyzer:
     def get_messages_for_process_optimized(self, process_id, limit=50, offset=0):
         """Optimized message loading with pagination"""
         cache_key = f"messages_{process_id}_{limit}_{offset}"
-        current_time = time.time()
-        
-        if (cache_key in self._cache and 
-            current_time - self._cache_time.get(cache_key, 0) < self.cache_timeout):
-            return self._cache[cache_key]
-        
+
+        # Revalidate against the folder's mtime instead of a TTL: adding or
+        # removing a .msg bumps the directory mtime, so a single stat tells
+        # us whether the cached list is still current
+        try:
+            dir_mtime_ns = os.stat(os.path.join(self.base_folder, process_id)).st_mtime_ns
+        except OSError:
+            dir_mtime_ns = None
+
+        cached = self._cache.get(cache_key)
+        if cached is not None and cached[0] == dir_mtime_ns:
+            envelope = cached[1]
+            # Status/comments live outside the cache; overlay on every read
+            for message_data in envelope["messages"]:
+                self._apply_saved_state(message_data)
+            return envelope
+
         print(f"Loading messages for {process_id} (limit: {limit}, offset: {offset})")
-        
+
         messages = self._load_messages_batch(process_id, limit, offset)
-        
-        self._cache[cache_key] = messages
-        self._cache_time[cache_key] = current_time
-        
+
+        with self._lock:
+            self._cache[cache_key] = (dir_mtime_ns, messages)
+
         return messages
     
     def _load_messages_batch(self, process_id, limit, offset):
         """Load only a batch of messages"""
         messages = []
+        total_count = 0
         process_path = os.path.join(self.base_folder, process_id)
         
         if not os.path.exists(process_path):
@@ -96,26 +208,58 @@ class OptimizedMSGAnalyzer:
             }
         
         try:
-            msg_files = glob.glob(os.path.join(process_path, "*.msg"))
+            # Single scandir pass; DirEntry.stat() reuses data from the listing
+            with os.scandir(process_path) as it:
+                msg_files = [(entry.path, entry.stat())
+                             for entry in it
+                             if entry.name.lower().endswith('.msg') and entry.is_file(follow_symlinks=False)]
             total_count = len(msg_files)
-            msg_files.sort(key=os.path.getmtime, reverse=True)
-            
+            msg_files.sort(key=lambda pair: pair[1].st_mtime, reverse=True)
+
             batch_files = msg_files[offset:offset + limit]
             
             print(f"Processing {len(batch_files)} files out of {total_count} total")
-            
-            for i, msg_file in enumerate(batch_files):
-                try:
-                    filename = os.path.basename(msg_file)
-                    message_id = f"{process_id}_{os.path.splitext(filename)[0]}"
-                    
-                    # Create realistic sample data
-                    message_data = self._create_sample_message_data(msg_file, process_id, message_id, i)
-                    messages.append(message_data)
-                    
-                except Exception as e:
-                    print(f"Error with {msg_file}: {e}")
-                    continue
+
+            def build_one(index, msg_file, st):
+                # A file's data only changes when the file does: reuse the
+                # cached dict while its (mtime, size) are unchanged
+                cached = self._file_cache.get(msg_file)
+                if cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+                    return cached[2]
+
+                filename = os.path.basename(msg_file)
+                message_id = f"{process_id}_{os.path.splitext(filename)[0]}"
+                message_data = self._create_sample_message_data(msg_file, process_id, message_id, index)
+                with self._lock:
+                    if len(self._file_cache) >= self.file_cache_limit:
+                        self._file_cache.clear()
+                    self._file_cache[msg_file] = (st.st_mtime_ns, st.st_size, message_data)
+                return message_data
+
+            if len(batch_files) < 4:
+                # Pool overhead dominates for tiny batches
+                for i, (msg_file, st) in enumerate(batch_files):
+                    try:
+                        messages.append(build_one(i, msg_file, st))
+                    except Exception as e:
+                        print(f"Error with {msg_file}: {e}")
+            else:
+                # Per-file work runs on the shared pool; results are
+                # collected as they complete and sorted afterwards
+                future_to_file = {
+                    self.thread_pool.submit(build_one, i, msg_file, st): msg_file
+                    for i, (msg_file, st) in enumerate(batch_files)
+                }
+                for future in as_completed(future_to_file):
+                    try:
+                        messages.append(future.result())
+                    except Exception as e:
+                        print(f"Error with {future_to_file[future]}: {e}")
+
+            # Status/comments stay out of the per-file cache and are
+            # overlaid at read time, so mutations never invalidate it
+            for message_data in messages:
+                self._apply_saved_state(message_data)
             
             messages.sort(key=lambda x: x.get('date', ''), reverse=True)
             
@@ -131,6 +275,12 @@ class OptimizedMSGAnalyzer:
             "limit": limit
         }
     
+    def _apply_saved_state(self, message_data):
+        """Overlay saved status and comments onto a cached message dict"""
+        message_id = message_data["id"]
+        message_data["status"] = self.message_status.get(message_id, "untagged")
+        message_data["comments"] = self.message_comments.get(message_id, [])
+
     def _create_sample_message_data(self, msg_file, process_id, message_id, index):
         """Create realistic sample message data"""
         subjects = [
@@ -188,11 +338,10 @@ class OptimizedMSGAnalyzer:
             "from": random.choice(senders),
             "to": "team@company.com, managers@company.com",
             "date": message_date.isoformat(),
-            "body": random.choice(bodies),
             "body_preview": random.choice(bodies)[:100] + "...",
             "body_type": "text",
             "status": self.message_status.get(message_id, "untagged"),
-            "threadId": f"thread_{hash(subject) % 1000}",
+            "threadId": _thread_id(subject),
             "filename": os.path.basename(msg_file),
             "attachments": [{"name": "document.pdf", "url": f"/api/attachment/{message_id}/0", "type": "PDF"}] if index % 4 == 0 else [],
             "containsThread": index % 3 == 0,
@@ -204,12 +353,14 @@ class OptimizedMSGAnalyzer:
     def get_message_full_content(self, process_id, message_id):
         """Load full content only when needed"""
         cache_key = f"full_{message_id}"
-        if cache_key in self._cache:
-            return self._cache[cache_key]
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            self._apply_saved_state(cached)
+            return cached
         
         # Create enhanced full content
         full_message = self._create_sample_message_data(
-            f"{message_id.replace(process_id + '_', '')}.msg", 
+            f"{message_id.removeprefix(process_id + '_')}.msg", 
             process_id, 
             message_id, 
             hash(message_id) % 10
@@ -243,9 +394,9 @@ This would be the actual content extracted from the .msg file in a production en
         ]
         
         # Cache full content
-        self._cache[cache_key] = full_message
-        self._cache_time[cache_key] = time.time()
-        
+        with self._lock:
+            self._cache[cache_key] = full_message
+
         return full_message
     
     def get_attachment(self, process_id, message_id, attachment_index):
@@ -260,11 +411,13 @@ This would be the actual content extracted from the .msg file in a production en
     
     def update_message_status(self, process_id, message_id, status):
         try:
-            self.message_status[message_id] = status
-            # Invalidate relevant caches
-            for key in list(self._cache.keys()):
-                if f"messages_{process_id}" in key or f"full_{message_id}" in key:
-                    del self._cache[key]
+            # No cache invalidation: status is overlaid onto cached
+            # messages at read time
+            with self._lock:
+                self.message_status[message_id] = status
+                if self._db is not None:
+                    self._db.execute('INSERT OR REPLACE INTO status VALUES (?, ?)',
+                                     (message_id, status))
             return True
         except Exception as e:
             print(f"Error updating status: {e}")
@@ -272,30 +425,52 @@ This would be the actual content extracted from the .msg file in a production en
     
     def add_comment_to_message(self, process_id, message_id, comment_data):
         try:
-            if message_id not in self.message_comments:
-                self.message_comments[message_id] = []
-            
-            comment_data["date"] = time.strftime("%Y-%m-%dT%H:%M:%S")
-            self.message_comments[message_id].append(comment_data)
-            
-            # Invalidate relevant caches
-            for key in list(self._cache.keys()):
-                if f"messages_{process_id}" in key or f"full_{message_id}" in key:
-                    del self._cache[key]
-                    
+            comment_data["date"] = _now_iso()
+            # No cache invalidation: comments are overlaid onto cached
+            # messages at read time
+            with self._lock:
+                self.message_comments.setdefault(message_id, []).append(comment_data)
+                if self._db is not None:
+                    self._db.execute('INSERT INTO comments VALUES (?, ?)',
+                                     (message_id, json.dumps(comment_data)))
             return True
         except Exception as e:
             print(f"Error adding comment: {e}")
             return False
     
     def clear_cache(self):
-        self._cache.clear()
-        self._cache_time.clear()
+        with self._lock:
+            self._cache.clear()
+            self._file_cache.clear()
 
 # Create analyzer
 analyzer = OptimizedMSGAnalyzer()
 
+class _ChunkSink:
+    """File-like adapter that frames writes as HTTP chunks.
+
+    Lets gzip.GzipFile stream compressed output straight onto a chunked
+    response without buffering it first.
+    """
+    def __init__(self, handler):
+        self.handler = handler
+
+    def write(self, data):
+        if data:
+            self.handler._write_chunk(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
 class MSGHandler(http.server.SimpleHTTPRequestHandler):
+    # Buffer wfile so status line, headers, and small JSON bodies leave in
+    # one send() instead of one syscall per write; handle_one_request
+    # flushes after each response
+    wbufsize = 16 * 1024
+    # Chunked transfer encoding (used for message lists) needs HTTP/1.1
+    protocol_version = "HTTP/1.1"
+
     def do_GET(self):
         if self.path.startswith('/api/'):
             self.handle_api_request()
@@ -311,16 +486,17 @@ class MSGHandler(http.server.SimpleHTTPRequestHandler):
     def serve_html(self):
         try:
             if self.path == '/' or self.path.endswith('.html'):
-                with open('index.html', 'r', encoding='utf-8') as f:
-                    html_content = f.read()
-                
+                if _INDEX_BYTES is None:
+                    self.send_error(404, "index.html not found")
+                    return
                 self.send_response(200)
                 self.send_header('Content-type', 'text/html; charset=utf-8')
+                self.send_header('Content-length', _INDEX_LEN)
                 self.end_headers()
-                self.wfile.write(html_content.encode('utf-8'))
+                self.wfile.write(_INDEX_BYTES)
             else:
                 super().do_GET()
-                
+
         except Exception as e:
             print(f"Error serving HTML: {e}")
             self.send_error(500, f"Error serving page: {str(e)}")
@@ -331,6 +507,8 @@ class MSGHandler(http.server.SimpleHTTPRequestHandler):
                 self.handle_processes()
             elif self.path.startswith('/api/messages/'):
                 self.handle_messages()
+            elif self.path.startswith('/api/message/') and self.path.endswith('/body'):
+                self.handle_message_body()
             elif self.path.startswith('/api/message/'):
                 self.handle_single_message()
             elif self.path.startswith('/api/attachment/'):
@@ -346,11 +524,20 @@ class MSGHandler(http.server.SimpleHTTPRequestHandler):
     
     def handle_api_post(self):
         try:
+            # Control endpoints only carry tiny JSON payloads; reject
+            # oversized bodies outright — truncating the read would leave
+            # the remainder on the socket to desync the next keep-alive
+            # request
             content_length = int(self.headers.get('Content-Length', 0))
+            if content_length > (1 << 20):
+                self.close_connection = True
+                self.send_error(413, "Request body too large")
+                return
             post_data = self.rfile.read(content_length) if content_length > 0 else b'{}'
             
             if self.path.startswith('/api/message/'):
-                path_parts = self.path.split('/')
+                # Cap the split at the deepest segment the API uses
+                path_parts = self.path.split('/', 5)
                 if len(path_parts) >= 5:
                     process_id = path_parts[3]
                     message_id = path_parts[4]
@@ -382,27 +569,30 @@ class MSGHandler(http.server.SimpleHTTPRequestHandler):
             self.send_error(500, f"Error retrieving processes: {str(e)}")
     
     def handle_messages(self):
-        path_parts = self.path.split('/')
+        # Parse the URL once: splitting the raw path would leave the query
+        # string glued onto the process id
+        parsed = urlparse(self.path)
+        path_parts = parsed.path.split('/', 5)
         process_id = path_parts[3] if len(path_parts) > 3 else None
-        
+
         if not process_id:
             self.send_error(400, "Process ID required")
             return
-        
-        query = urlparse(self.path).query
-        params = parse_qs(query)
+
+        params = parse_qs(parsed.query)
         limit = int(params.get('limit', [50])[0])
         offset = int(params.get('offset', [0])[0])
         
         try:
             messages_data = analyzer.get_messages_for_process_optimized(process_id, limit, offset)
-            self.send_json_response(messages_data)
+            meta = {key: value for key, value in messages_data.items() if key != 'messages'}
+            self.send_json_stream(meta, messages_data['messages'])
         except Exception as e:
             print(f"Error in handle_messages: {e}")
             self.send_error(500, f"Error retrieving messages: {str(e)}")
     
     def handle_single_message(self):
-        path_parts = self.path.split('/')
+        path_parts = self.path.split('/', 5)
         if len(path_parts) < 5:
             self.send_error(400, "Invalid message URL")
             return
@@ -417,8 +607,29 @@ class MSGHandler(http.server.SimpleHTTPRequestHandler):
             print(f"Error loading full message: {e}")
             self.send_error(500, f"Error loading message: {str(e)}")
     
+    def handle_message_body(self):
+        """Serve just the body for one message, fetched on demand by the UI"""
+        path_parts = self.path.split('/', 5)
+        if len(path_parts) < 6:
+            self.send_error(400, "Invalid message body URL")
+            return
+
+        process_id = path_parts[3]
+        message_id = path_parts[4]
+
+        try:
+            full_message = analyzer.get_message_full_content(process_id, message_id)
+            self.send_json_response({
+                "id": message_id,
+                "body": full_message.get("body", ""),
+                "body_type": full_message.get("body_type", "text")
+            })
+        except Exception as e:
+            print(f"Error loading message body: {e}")
+            self.send_error(500, f"Error loading message body: {str(e)}")
+
     def handle_attachment(self):
-        path_parts = self.path.split('/')
+        path_parts = self.path.split('/', 5)
         if len(path_parts) < 6:
             self.send_error(400, "Invalid attachment URL")
             return
@@ -440,7 +651,7 @@ class MSGHandler(http.server.SimpleHTTPRequestHandler):
     
     def handle_update_status(self, process_id, message_id, post_data):
         try:
-            data = json.loads(post_data.decode('utf-8'))
+            data = _loads(post_data)
             status = data.get('status')
             
             if status not in ['keep', 'review', 'untagged']:
@@ -459,7 +670,7 @@ class MSGHandler(http.server.SimpleHTTPRequestHandler):
     
     def handle_add_comment(self, process_id, message_id, post_data):
         try:
-            data = json.loads(post_data.decode('utf-8'))
+            data = _loads(post_data)
             success = analyzer.add_comment_to_message(process_id, message_id, data)
             
             if success:
@@ -476,16 +687,83 @@ class MSGHandler(http.server.SimpleHTTPRequestHandler):
     
     def handle_health(self):
         self.send_json_response({
-            "status": "healthy", 
-            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "status": "healthy",
+            "timestamp": _now_iso(),
             "version": "2.0-optimized"
         })
     
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii'))
+        self.wfile.write(data)
+        self.wfile.write(b"\r\n")
+
+    def send_json_stream(self, meta, messages):
+        """Stream a message list as chunked JSON.
+
+        Each message object is encoded and written individually, so the full
+        serialized list never has to sit in memory at once. Output is gzipped
+        on the fly when the client advertises support.
+        """
+        compress = 'gzip' in self.headers.get('Accept-Encoding', '')
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json; charset=utf-8')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.send_header('Vary', 'Accept-Encoding')
+        if compress:
+            self.send_header('Content-Encoding', 'gzip')
+        self.end_headers()
+
+        out = _ChunkSink(self)
+        if compress:
+            out = gzip.GzipFile(fileobj=out, mode='wb', compresslevel=1)
+
+        out.write(b'{"messages":[')
+        for i, message in enumerate(messages):
+            piece = _dumps(message)
+            out.write(b',' + piece if i else piece)
+        # Close the array and splice in the pagination metadata
+        out.write(b'],' + _dumps(meta)[1:] if meta else b']}')
+        if compress:
+            out.close()
+        self.wfile.write(b"0\r\n\r\n")
+
     def send_json_response(self, data):
         try:
-            response_data = json.dumps(data, ensure_ascii=False).encode('utf-8')
+            response_data = _dumps(data)
+            # Pick the encoding first so the ETag can identify the exact
+            # variant: a strong tag shared across identity/gzip/br bodies
+            # would corrupt intermediary caches
+            encoding = None
+            if len(response_data) >= 1024:
+                # Message bodies compress well; skip tiny payloads where
+                # the header overhead outweighs the savings
+                accepted = self.headers.get('Accept-Encoding', '')
+                if brotli is not None and 'br' in accepted:
+                    encoding = 'br'
+                elif 'gzip' in accepted:
+                    encoding = 'gzip'
+            # One hash pass over the payload lets pollers revalidate with a
+            # 304 instead of re-downloading an unchanged body
+            digest = hashlib.blake2b(response_data, digest_size=8).hexdigest()
+            etag = f'"{digest}-{encoding}"' if encoding else f'"{digest}"'
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Vary', 'Accept-Encoding')
+                self.end_headers()
+                return
             self.send_response(200)
             self.send_header('Content-type', 'application/json; charset=utf-8')
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Vary', 'Accept-Encoding')
+            if encoding == 'br':
+                response_data = brotli.compress(response_data, quality=4)
+                self.send_header('Content-Encoding', 'br')
+            elif encoding == 'gzip':
+                # Level 1 trades a little density for much faster encode
+                response_data = gzip.compress(response_data, compresslevel=1)
+                self.send_header('Content-Encoding', 'gzip')
             self.send_header('Content-length', str(len(response_data)))
             self.end_headers()
             self.wfile.write(response_data)
@@ -496,17 +774,30 @@ class MSGHandler(http.server.SimpleHTTPRequestHandler):
     def log_message(self, format, *args):
         print(f"{self.client_address[0]} - {format % args}")
 
+# index.html never changes during a server run: read, encode, and measure
+# it once at startup instead of per request
+_INDEX_BYTES = None
+_INDEX_LEN = '0'
+
 def start_server(port=8000):
+    global _INDEX_BYTES, _INDEX_LEN
     print("🚀 Starting OPTIMIZED MSG Analyzer Server...")
     print(f"📁 Working directory: {os.getcwd()}")
-    
-    if not os.path.exists('index.html'):
+
+    try:
+        with open('index.html', 'rb') as f:
+            _INDEX_BYTES = f.read()
+        _INDEX_LEN = str(len(_INDEX_BYTES))
+    except OSError:
         print("❌ ERROR: index.html not found!")
         print("Please make sure index.html is in the same directory as server.py")
         return
-    
+
     try:
-        with socketserver.TCPServer(("", port), MSGHandler) as httpd:
+        # Threaded server: a slow message load no longer blocks health
+        # checks or attachment downloads behind it
+        with http.server.ThreadingHTTPServer(("", port), MSGHandler) as httpd:
+            httpd.daemon_threads = True
             print(f"✅ Server started successfully on http://localhost:{port}")
             print("⚡ Features: Lazy Loading + Pagination + Real-time Search")
             print("📂 Message folder: msg_files/")
@@ -0,0 +1,8 @@
+"""WSGI entry point for running the MSG Analyzer backend under a production server.
+
+Example:
+    gunicorn -w 4 --threads 8 --worker-class gthread wsgi:application
+"""
+from msg_analyser import app
+
+application = app